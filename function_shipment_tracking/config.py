@@ -1,30 +1,50 @@
 import os
+from dataclasses import dataclass
+from typing import Optional
 
+@dataclass(frozen=True)
 class Config:
     """Configuration for Shipment Tracking Cloud Function"""
     
     # BigQuery
-    PROJECT_ID = os.getenv('GCP_PROJECT', 'projectbamo')
+    PROJECT_ID: str
     
     # Supabase
-    SUPABASE_URL = os.getenv('SUPABASE_URL')
-    SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    SUPABASE_URL: Optional[str]
+    SUPABASE_SERVICE_ROLE_KEY: Optional[str]
     
     # Timeouts and retries
-    SUPABASE_TIMEOUT = int(os.getenv('SUPABASE_TIMEOUT', 30))
-    MAX_RETRY_ATTEMPTS = int(os.getenv('MAX_RETRY_ATTEMPTS', 3))
+    SUPABASE_TIMEOUT: int
+    MAX_RETRY_ATTEMPTS: int
     
     # Query parameters
-    LOOKBACK_MINUTES = int(os.getenv('LOOKBACK_MINUTES', 20))
+    LOOKBACK_MINUTES: int
     
     # Batch processing
-    BATCH_SIZE = int(os.getenv('BATCH_SIZE', 100))
+    BATCH_SIZE: int
+    MAX_BATCH_BYTES: int
+    SUPABASE_PARALLELISM: int
     
     # Logging
-    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVEL: str
     
     @classmethod
-    def validate(cls):
+    def load(cls) -> 'Config':
+        """Read configuration from environment variables"""
+        return cls(
+            PROJECT_ID=os.getenv('GCP_PROJECT', 'projectbamo'),
+            SUPABASE_URL=os.getenv('SUPABASE_URL'),
+            SUPABASE_SERVICE_ROLE_KEY=os.getenv('SUPABASE_SERVICE_ROLE_KEY'),
+            SUPABASE_TIMEOUT=int(os.getenv('SUPABASE_TIMEOUT', 30)),
+            MAX_RETRY_ATTEMPTS=int(os.getenv('MAX_RETRY_ATTEMPTS', 3)),
+            LOOKBACK_MINUTES=int(os.getenv('LOOKBACK_MINUTES', 20)),
+            BATCH_SIZE=int(os.getenv('BATCH_SIZE', 1000)),
+            MAX_BATCH_BYTES=int(os.getenv('MAX_BATCH_BYTES', 5 * 1024 * 1024)),
+            SUPABASE_PARALLELISM=int(os.getenv('SUPABASE_PARALLELISM', 4)),
+            LOG_LEVEL=os.getenv('LOG_LEVEL', 'INFO')
+        )
+    
+    def validate(self):
         """Validate required configuration"""
         required_vars = [
             'SUPABASE_URL',
@@ -33,10 +53,13 @@ class Config:
         
         missing_vars = []
         for var in required_vars:
-            if not getattr(cls, var):
+            if not getattr(self, var):
                 missing_vars.append(var)
         
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
         
-        return True
\ No newline at end of file
+        return True
+
+# Environment variables are parsed once per process
+CONFIG = Config.load()
@@ -2,69 +2,109 @@ import functions_framework
 from flask import Request
 import json
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 from services.bigquery_service import BigQueryService
 from services.transformer_service import ShipmentTransformerService
-from services.supabase_service import SupabaseService
+from services.supabase_service import SupabaseService, SupabaseResult
 from utils.logging_utils import setup_logger, log_structured
 
 logger = setup_logger(__name__)
 
+# Services live at module scope so warm invocations reuse the BigQuery client
+# and the pooled Supabase connection; the connectivity probe runs at cold start
+# and its successful result is cached by SupabaseService
+_bq_service: Optional[BigQueryService] = None
+_supabase_service: Optional[SupabaseService] = None
+
+def _get_services() -> Tuple[BigQueryService, SupabaseService]:
+    """Build the services once per instance, retrying on later calls if construction failed"""
+    global _bq_service, _supabase_service
+    if _bq_service is None:
+        _bq_service = BigQueryService()
+    if _supabase_service is None:
+        _supabase_service = SupabaseService()
+    return _bq_service, _supabase_service
+
+# A failure here (e.g. missing Supabase config) must not break the import;
+# the first request rebuilds the services and reports the error as a 500
+try:
+    _get_services()[1].test_connectivity()
+except Exception as e:
+    log_structured(logger, "Cold-start service setup failed, deferring to first request",
+                  severity='ERROR', error=str(e))
+
 @functions_framework.http
 def sync_shipment_tracking(request: Request):
     """
     HTTP Cloud Function to sync shipment tracking events from BigQuery to Supabase.
     
-    Triggered by Cloud Scheduler every 15 minutes.
+    Triggered by Cloud Scheduler every 15 minutes. Events are streamed from
+    BigQuery in Arrow batches; each batch is transformed and sent while the
+    next one is downloaded, so memory stays bounded to a couple of batches.
     """
     try:
         log_structured(logger, "Shipment tracking sync started")
         
-        # 1. Fetch tracking events from BigQuery
-        bq_service = BigQueryService()
-        events_df = bq_service.fetch_recent_tracking_events()
+        bq_service, supabase_service = _get_services()
+        transformer = ShipmentTransformerService()
+        bigquery_events = 0
+        valid_events = 0
+        connectivity_msg = None
+        results = []
+        pending = None
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # 1. Stream tracking events from BigQuery
+            for record_batch in bq_service.iter_record_batches():
+                events_df = record_batch.to_pandas()
+                if events_df.empty:
+                    continue
+                bigquery_events += len(events_df)
+                
+                # 2. Transform to Supabase format
+                tracking_events = transformer.transform_to_tracking_events(events_df)
+                if not tracking_events:
+                    continue
+                valid_events += len(tracking_events)
+                
+                # 3. Check connectivity to Supabase Edge Function before the first send
+                if connectivity_msg is None:
+                    connectivity_ok, connectivity_msg = supabase_service.test_connectivity()
+                    log_structured(logger, "Supabase connectivity test",
+                                  success=connectivity_ok,
+                                  details=connectivity_msg)
+                    
+                    if not connectivity_ok:
+                        error_msg = f"Supabase connectivity test failed: {connectivity_msg}"
+                        log_structured(logger, error_msg, severity='ERROR')
+                        return {'status': 'error', 'message': error_msg}, 500
+                
+                # 4. Send to Supabase in the background, keeping one batch in flight
+                if pending is not None:
+                    results.append(pending.result())
+                pending = executor.submit(supabase_service.send_tracking_events, tracking_events)
+            
+            if pending is not None:
+                results.append(pending.result())
         
-        if events_df.empty:
+        if not bigquery_events:
             log_structured(logger, "No tracking events found")
             return {'status': 'success', 'message': 'No tracking events to process'}, 200
         
-        log_structured(logger, "Fetched tracking events from BigQuery", 
-                      total_events=len(events_df))
-        
-        # 2. Transform to Supabase format
-        transformer = ShipmentTransformerService()
-        tracking_events = transformer.transform_to_tracking_events(events_df)
-        
-        if not tracking_events:
-            log_structured(logger, "No valid tracking events after transformation")
+        if not valid_events:
+            log_structured(logger, "No valid tracking events after transformation",
+                          bigquery_events=bigquery_events)
             return {'status': 'success', 'message': 'No valid tracking events to process'}, 200
         
-        log_structured(logger, "Transformed tracking events", 
-                      valid_events=len(tracking_events))
-        
-        # 3. Test connectivity to Supabase Edge Function first
-        supabase_service = SupabaseService()
-        
-        # Run connectivity test
-        connectivity_ok, connectivity_msg = supabase_service.test_connectivity()
-        log_structured(logger, "Supabase connectivity test",
-                      success=connectivity_ok,
-                      details=connectivity_msg)
-        
-        if not connectivity_ok:
-            error_msg = f"Supabase connectivity test failed: {connectivity_msg}"
-            log_structured(logger, error_msg, severity='ERROR')
-            return {'status': 'error', 'message': error_msg}, 500
-        
-        # 4. Send tracking events to Supabase Edge Function
-        result = supabase_service.send_tracking_events(tracking_events)
+        result = SupabaseResult.combine(results)
         
         # 5. Return summary
         response = {
             'status': 'completed',
-            'bigquery_events': len(events_df),
-            'valid_events': len(tracking_events),
+            'bigquery_events': bigquery_events,
+            'valid_events': valid_events,
             'connectivity_test': connectivity_msg,
             **result.to_dict()
         }
@@ -75,4 +115,4 @@ def sync_shipment_tracking(request: Request):
     except Exception as e:
         error_msg = f"Shipment tracking sync failed: {str(e)}"
         log_structured(logger, error_msg, severity='ERROR')
-        return {'status': 'error', 'message': error_msg}, 500
\ No newline at end of file
+        return {'status': 'error', 'message': error_msg}, 500
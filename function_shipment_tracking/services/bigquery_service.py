@@ -1,19 +1,67 @@
 from google.cloud import bigquery
-from typing import Optional
-import pandas as pd
+from google.cloud import bigquery_storage
+from functools import lru_cache
+from typing import Iterator, Optional, Tuple
+import pyarrow as pa
 from pathlib import Path
 
 from utils.logging_utils import setup_logger, log_structured
-from config import Config
+from config import CONFIG
 
 logger = setup_logger(__name__)
 
+DEFAULT_MARKETPLACES = ['meli', 'fala', 'walm', 'cenc']
+
+def _load_marketplace_query(marketplace: str) -> str:
+    """Load marketplace-specific tracking events query"""
+    query_path = Path(__file__).parent.parent / 'queries' / f'{marketplace}_tracking_events.sql'
+    
+    try:
+        with open(query_path, 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        logger.error(f"Marketplace tracking query file not found: {query_path}")
+        raise
+
+@lru_cache(maxsize=8)
+def _compile_unified_tracking_query(marketplaces: Tuple[str, ...]) -> str:
+    """
+    Combine marketplace tracking queries with UNION ALL.
+    
+    The SQL files are static for a deployment, so the result is cached per
+    process and warm invocations skip the disk reads entirely.
+    """
+    queries = []
+    for marketplace in marketplaces:
+        try:
+            marketplace_query = _load_marketplace_query(marketplace)
+            # Remove trailing semicolon if present to avoid UNION ALL syntax errors
+            marketplace_query = marketplace_query.rstrip().rstrip(';')
+            # Wrap each query in parentheses for proper UNION ALL syntax
+            queries.append(f"(\n{marketplace_query}\n)")
+        except FileNotFoundError:
+            logger.warning(f"Skipping marketplace {marketplace} - tracking query file not found")
+            continue
+    
+    if not queries:
+        raise ValueError("No valid marketplace tracking queries found")
+    
+    unified_query = "\n\nUNION ALL\n\n".join(queries)
+    
+    log_structured(logger, "Built unified tracking query",
+                  marketplaces=list(marketplaces),
+                  total_queries=len(queries))
+    
+    return unified_query
+
 class BigQueryService:
     """Handle all BigQuery operations for shipment tracking events"""
     
     def __init__(self, project_id: Optional[str] = None):
-        self.project_id = project_id or Config.PROJECT_ID
+        self.project_id = project_id or CONFIG.PROJECT_ID
         self.client = bigquery.Client(project=self.project_id)
+        # Storage Read API streams results as Arrow instead of paging JSON rows
+        self.bqstorage_client = bigquery_storage.BigQueryReadClient()
         
     def _load_query(self, query_name: str) -> str:
         """Load SQL query from file"""
@@ -26,85 +74,68 @@ class BigQueryService:
             logger.error(f"Query file not found: {query_path}")
             raise
     
-    def _load_marketplace_query(self, marketplace: str) -> str:
-        """Load marketplace-specific tracking events query"""
-        query_path = Path(__file__).parent.parent / 'queries' / f'{marketplace}_tracking_events.sql'
-        
-        try:
-            with open(query_path, 'r') as f:
-                return f.read()
-        except FileNotFoundError:
-            logger.error(f"Marketplace tracking query file not found: {query_path}")
-            raise
-    
     def _build_unified_tracking_query(self, marketplaces: list = None) -> str:
         """Build unified query by combining individual marketplace tracking queries"""
-        if marketplaces is None:
-            marketplaces = ['meli', 'fala', 'walm', 'cenc']
-        
-        queries = []
-        for marketplace in marketplaces:
-            try:
-                marketplace_query = self._load_marketplace_query(marketplace)
-                # Remove trailing semicolon if present to avoid UNION ALL syntax errors
-                marketplace_query = marketplace_query.rstrip().rstrip(';')
-                # Wrap each query in parentheses for proper UNION ALL syntax
-                queries.append(f"(\n{marketplace_query}\n)")
-            except FileNotFoundError:
-                logger.warning(f"Skipping marketplace {marketplace} - tracking query file not found")
-                continue
+        return _compile_unified_tracking_query(tuple(sorted(marketplaces or DEFAULT_MARKETPLACES)))
+    
+    def _run_tracking_query(self, lookback_minutes: int = None,
+                            marketplaces: list = None) -> bigquery.QueryJob:
+        """Start the unified tracking events query job"""
+        lookback = lookback_minutes or CONFIG.LOOKBACK_MINUTES
         
-        if not queries:
-            raise ValueError("No valid marketplace tracking queries found")
+        # Build unified query dynamically from individual marketplace files
+        query = self._build_unified_tracking_query(marketplaces)
         
-        unified_query = "\n\nUNION ALL\n\n".join(queries)
+        # Use parameterized query for security
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter(
+                    "lookback_minutes", "INT64", lookback
+                )
+            ]
+        )
         
-        log_structured(logger, "Built unified tracking query",
-                      marketplaces=marketplaces,
-                      total_queries=len(queries))
+        log_structured(logger, "Executing BigQuery tracking events query",
+                     lookback_minutes=lookback,
+                     marketplaces=marketplaces or DEFAULT_MARKETPLACES)
         
-        return unified_query
+        return self.client.query(query, job_config=job_config)
     
-    def fetch_recent_tracking_events(self, lookback_minutes: int = None, marketplaces: list = None) -> pd.DataFrame:
+    def iter_record_batches(self, lookback_minutes: int = None,
+                            marketplaces: list = None) -> Iterator[pa.RecordBatch]:
         """
-        Fetch tracking events from multiple marketplaces with recent updates.
+        Stream tracking events as Arrow RecordBatches from the Storage Read API.
+        
+        Only one batch is held in memory at a time, so callers can transform
+        and send each batch as it arrives.
         
         Args:
             lookback_minutes: How far back to look for tracking events
             marketplaces: List of marketplaces to include (default: all available)
             
-        Returns:
-            DataFrame with tracking event data
+        Yields:
+            Arrow RecordBatches with tracking event data
         """
-        lookback = lookback_minutes or Config.LOOKBACK_MINUTES
-        
         try:
-            # Build unified query dynamically from individual marketplace files
-            query = self._build_unified_tracking_query(marketplaces)
-            
-            # Use parameterized query for security
-            job_config = bigquery.QueryJobConfig(
-                query_parameters=[
-                    bigquery.ScalarQueryParameter(
-                        "lookback_minutes", "INT64", lookback
-                    )
-                ]
-            )
-            
-            log_structured(logger, "Executing BigQuery tracking events query",
-                         lookback_minutes=lookback,
-                         marketplaces=marketplaces or ['meli', 'fala', 'walm', 'cenc'])
+            query_job = self._run_tracking_query(lookback_minutes, marketplaces)
+            rows = query_job.result()
             
-            query_job = self.client.query(query, job_config=job_config)
-            df = query_job.to_dataframe()
+            rows_returned = 0
+            for record_batch in rows.to_arrow_iterable(bqstorage_client=self.bqstorage_client):
+                rows_returned += record_batch.num_rows
+                yield record_batch
             
             log_structured(logger, "Tracking events query completed",
-                         rows_returned=len(df),
+                         rows_returned=rows_returned,
                          bytes_processed=query_job.total_bytes_processed)
             
-            return df
-            
         except Exception as e:
             log_structured(logger, "BigQuery tracking events error",
                          severity='ERROR', error=str(e))
-            raise
\ No newline at end of file
+            raise
+
+# Build the default query during cold start so the first request doesn't pay for it
+try:
+    _compile_unified_tracking_query(tuple(sorted(DEFAULT_MARKETPLACES)))
+except ValueError as e:
+    logger.error(f"Failed to preload unified tracking query: {e}")
@@ -1,13 +1,25 @@
 import requests
-from typing import Dict, Any, Tuple, List
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Iterator, Optional, Tuple, List
 from dataclasses import dataclass
-import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+import math
 
-from config import Config
+from config import Config, CONFIG
 from utils.logging_utils import setup_logger, log_structured
 
 logger = setup_logger(__name__)
 
+# Upper bound on error messages kept in memory per sync
+MAX_ERROR_KEEP = 50
+
+# Request body framing around the comma-separated encoded events
+_BODY_PREFIX = b'{"events":['
+_BODY_SUFFIX = b']}'
+
 @dataclass
 class SupabaseResult:
     """Result of Supabase Edge Function operation"""
@@ -23,21 +35,64 @@ class SupabaseResult:
             'failed': self.failed,
             'errors': self.errors[:10]  # Limit errors returned
         }
+    
+    @classmethod
+    def combine(cls, results: List['SupabaseResult']) -> 'SupabaseResult':
+        """Merge the results of several send_tracking_events calls"""
+        return cls(
+            total=sum(r.total for r in results),
+            successful=sum(r.successful for r in results),
+            failed=sum(r.failed for r in results),
+            errors=[error for r in results for error in r.errors][:MAX_ERROR_KEEP]
+        )
 
 class SupabaseService:
     """Handle Supabase Edge Function calls with retry logic"""
     
-    def __init__(self):
-        Config.validate()  # Ensure required config is present
+    # Cached successful connectivity test result, shared across instances
+    _connectivity_ok: Optional[Tuple[bool, str]] = None
+    
+    def __init__(self, config: Config = CONFIG):
+        config.validate()  # Ensure required config is present
+        self.config = config
         
-        self.url = f"{Config.SUPABASE_URL}/functions/v1/process-shipment-tracking"
+        self.url = f"{config.SUPABASE_URL}/functions/v1/process-shipment-tracking"
         self.headers = {
-            'Authorization': f'Bearer {Config.SUPABASE_SERVICE_ROLE_KEY}',
+            'Authorization': f'Bearer {config.SUPABASE_SERVICE_ROLE_KEY}',
             'Content-Type': 'application/json'
         }
-        self.timeout = Config.SUPABASE_TIMEOUT
-        self.max_retries = Config.MAX_RETRY_ATTEMPTS
-        self.batch_size = Config.BATCH_SIZE
+        self.timeout = config.SUPABASE_TIMEOUT
+        self.max_retries = config.MAX_RETRY_ATTEMPTS
+        self.batch_size = config.BATCH_SIZE
+        self.max_batch_bytes = config.MAX_BATCH_BYTES
+        self.parallelism = config.SUPABASE_PARALLELISM
+        
+        # Keep-alive session so batches reuse the TLS connection to Supabase.
+        # urllib3 is the only retry layer: connect errors, read timeouts and
+        # server errors all draw from one budget of MAX_RETRY_ATTEMPTS retries
+        # per batch, with exponential backoff.
+        retries = Retry(
+            total=self.max_retries,
+            backoff_factor=1,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['POST']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retries,
+                              pool_connections=8,
+                              pool_maxsize=max(16, self.parallelism))
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # The connectivity probe is a single short attempt; it must not inherit
+        # the batch retries, which would stack timeouts at cold start
+        probe_adapter = HTTPAdapter(max_retries=0)
+        self.probe_session = requests.Session()
+        self.probe_session.headers.update(self.headers)
+        self.probe_session.mount('https://', probe_adapter)
+        self.probe_session.mount('http://', probe_adapter)
         
         # Log configuration for debugging (mask sensitive data)
         log_structured(logger, "SupabaseService initialized",
@@ -45,86 +100,85 @@ class SupabaseService:
                       timeout=self.timeout,
                       max_retries=self.max_retries,
                       batch_size=self.batch_size,
-                      has_auth_token=bool(Config.SUPABASE_SERVICE_ROLE_KEY))
+                      max_batch_bytes=self.max_batch_bytes,
+                      parallelism=self.parallelism,
+                      has_auth_token=bool(config.SUPABASE_SERVICE_ROLE_KEY))
+    
+    @staticmethod
+    def _response_preview(response: requests.Response, limit: int) -> str:
+        """Decode only the first bytes of a response body for logging"""
+        return response.content[:limit].decode('utf-8', 'replace')
     
-    def _send_batch_to_supabase(self, events: List[Dict[str, Any]], 
-                               retry_count: int = 0) -> Tuple[bool, str, Dict[str, Any]]:
+    def _send_batch_to_supabase(self, events: List[Dict[str, Any]],
+                                body: Optional[bytes] = None) -> Tuple[bool, str, Dict[str, Any]]:
         """
         Send batch of events to Supabase Edge Function with retry logic.
         
+        Args:
+            events: Events in the batch
+            body: Pre-encoded request body from _chunk_events; encoded here if omitted
+        
         Returns:
             Tuple of (success: bool, message: str, response_data: dict)
         """
-        payload = {"events": events}
+        if body is None:
+            body = orjson.dumps({"events": events})
         
-        # Add detailed request logging for debugging
-        print(f"SENDING REQUEST TO: {self.url}")
-        print(f"PAYLOAD SIZE: {len(events)} events")
-        print(f"HEADERS: {dict(self.headers)}")
+        # Per-request logging is only useful when debugging
+        debug = self.config.LOG_LEVEL == 'DEBUG'
         
-        log_structured(logger, "Sending request to Supabase Edge Function",
-                      url=self.url,
-                      headers={k: v[:20] + "..." if k == "Authorization" else v for k, v in self.headers.items()},
-                      payload_size=len(events),
-                      timeout=self.timeout)
+        if debug:
+            log_structured(logger, "Sending request to Supabase Edge Function",
+                          severity='DEBUG',
+                          url=self.url,
+                          headers={k: v[:20] + "..." if k == "Authorization" else v for k, v in self.headers.items()},
+                          payload_size=len(events),
+                          timeout=self.timeout)
         
+        # Retries happen inside the session adapter, which resends the same body
         try:
-            print(f"MAKING POST REQUEST...")
-            response = requests.post(
+            response = self.session.post(
                 url=self.url,
-                headers=self.headers,
-                json=payload,
+                data=body,
                 timeout=self.timeout
             )
-            print(f"REQUEST COMPLETED")
-            
-            # Use print for immediate visibility in Cloud Functions logs
-            print(f"SUPABASE RESPONSE: Status={response.status_code}, Text={response.text[:500]}")
             
-            log_structured(logger, "Supabase Edge Function response",
-                         status_code=response.status_code,
-                         events_sent=len(events),
-                         response_text=response.text[:200])
+            if debug:
+                log_structured(logger, "Supabase Edge Function response",
+                             severity='DEBUG',
+                             status_code=response.status_code,
+                             events_sent=len(events),
+                             response_text=self._response_preview(response, 200))
             
             if response.status_code == 200:
                 try:
-                    response_data = response.json()
-                    print(f"SUCCESS: Got 200 response with data: {response_data}")
+                    response_data = orjson.loads(response.content)
                     return True, f"Success: {response.status_code}", response_data
                 except ValueError:
                     # Response is not JSON, but status is 200
-                    print(f"SUCCESS: Got 200 response but no JSON data")
                     return True, f"Success: {response.status_code}", {}
             else:
-                error_msg = f"Failed: {response.status_code} - {response.text[:200]}"
-                print(f"ERROR: {error_msg}")
+                error_msg = f"Failed: {response.status_code} - {self._response_preview(response, 200)}"
                 log_structured(logger, "Supabase Edge Function error",
                              severity='ERROR',
                              status_code=response.status_code,
-                             response_text=response.text[:200])
-                
-                # Retry on server errors
-                if response.status_code >= 500 and retry_count < self.max_retries:
-                    time.sleep(2 ** retry_count)  # Exponential backoff
-                    return self._send_batch_to_supabase(events, retry_count + 1)
+                             response_text=self._response_preview(response, 200))
                 
                 return False, error_msg, {}
                 
-        except requests.exceptions.Timeout:
-            error_msg = f"Timeout after {self.timeout}s"
-            log_structured(logger, "Supabase request timeout",
-                         severity='ERROR',
-                         timeout=self.timeout,
-                         events_count=len(events),
-                         url=self.url)
-            
-            if retry_count < self.max_retries:
-                time.sleep(2 ** retry_count)
-                return self._send_batch_to_supabase(events, retry_count + 1)
-            
-            return False, error_msg, {}
+        except (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout) as e:
+            # Read timeouts that used up the retry budget surface as a
+            # ConnectionError wrapping urllib3's ReadTimeoutError
+            reason = getattr(e.args[0], 'reason', None) if e.args else None
+            if isinstance(e, requests.exceptions.ReadTimeout) or isinstance(reason, ReadTimeoutError):
+                log_structured(logger, "Supabase request timeout",
+                             severity='ERROR',
+                             attempts=self.max_retries + 1,
+                             timeout=self.timeout,
+                             events_count=len(events),
+                             url=self.url)
+                return False, f"Timeout after {self.timeout}s", {}
             
-        except requests.exceptions.ConnectionError as e:
             error_msg = f"Connection error: {str(e)}"
             log_structured(logger, "Supabase connection error",
                          severity='ERROR',
@@ -151,44 +205,83 @@ class SupabaseService:
                          events_count=len(events))
             return False, error_msg, {}
     
-    def _chunk_events(self, events: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
-        """Split events into batches of specified size"""
-        chunks = []
-        for i in range(0, len(events), self.batch_size):
-            chunks.append(events[i:i + self.batch_size])
-        return chunks
+    def _chunk_events(self, events: List[Dict[str, Any]]) -> Iterator[Tuple[List[Dict[str, Any]], bytes]]:
+        """
+        Lazily split events into batches capped by event count and body size.
+        
+        Each event is encoded once; the encoded bytes are joined into the
+        request body, so the byte cap counts the exact bytes sent.
+        
+        Yields:
+            Tuples of (batch events, encoded request body)
+        """
+        empty_bytes = len(_BODY_PREFIX) + len(_BODY_SUFFIX)
+        current_chunk = []
+        current_encoded = []
+        current_bytes = empty_bytes
+        
+        for event in events:
+            encoded = orjson.dumps(event)
+            # One comma separates this event from the previous one
+            added_bytes = len(encoded) + (1 if current_encoded else 0)
+            if current_chunk and (len(current_chunk) >= self.batch_size or
+                                  current_bytes + added_bytes > self.max_batch_bytes):
+                yield current_chunk, _BODY_PREFIX + b','.join(current_encoded) + _BODY_SUFFIX
+                current_chunk = []
+                current_encoded = []
+                current_bytes = empty_bytes
+                added_bytes = len(encoded)
+            
+            current_chunk.append(event)
+            current_encoded.append(encoded)
+            current_bytes += added_bytes
+        
+        if current_chunk:
+            yield current_chunk, _BODY_PREFIX + b','.join(current_encoded) + _BODY_SUFFIX
     
     def test_connectivity(self) -> Tuple[bool, str]:
         """
         Test connectivity to Supabase Edge Function with a minimal request.
         This helps diagnose endpoint URL, authentication, and network issues.
+        
+        A successful result is cached per process so warm invocations skip the
+        round trip; failures are probed again on the next call.
         """
-        test_payload = {"events": []}  # Empty events array should trigger validation error
+        if SupabaseService._connectivity_ok is not None:
+            return SupabaseService._connectivity_ok
+        
+        result = self._probe_connectivity()
+        if result[0]:
+            SupabaseService._connectivity_ok = result
+        return result
+    
+    def _probe_connectivity(self) -> Tuple[bool, str]:
+        """Send an empty events batch and interpret the Edge Function response"""
+        test_body = orjson.dumps({"events": []})  # Empty events array should trigger validation error
         
         log_structured(logger, "Testing Supabase Edge Function connectivity",
                       url=self.url)
         
         try:
-            response = requests.post(
+            response = self.probe_session.post(
                 url=self.url,
-                headers=self.headers,
-                json=test_payload,
+                data=test_body,
                 timeout=10  # Short timeout for test
             )
             
             log_structured(logger, "Connectivity test response",
                           status_code=response.status_code,
-                          response_text=response.text[:500])
+                          response_text=self._response_preview(response, 500))
             
             if response.status_code == 400:
                 # Expected: validation error for empty events array
-                return True, f"Connectivity OK - Got expected validation error (400): {response.text[:200]}"
+                return True, f"Connectivity OK - Got expected validation error (400): {self._response_preview(response, 200)}"
             elif response.status_code == 401:
-                return False, f"Authentication failed (401): {response.text[:200]}"
+                return False, f"Authentication failed (401): {self._response_preview(response, 200)}"
             elif response.status_code == 404:
-                return False, f"Endpoint not found (404): {response.text[:200]}"
+                return False, f"Endpoint not found (404): {self._response_preview(response, 200)}"
             else:
-                return True, f"Connectivity OK - Got response ({response.status_code}): {response.text[:200]}"
+                return True, f"Connectivity OK - Got response ({response.status_code}): {self._response_preview(response, 200)}"
                 
         except requests.exceptions.ConnectionError as e:
             return False, f"Connection failed: {str(e)}"
@@ -197,6 +290,44 @@ class SupabaseService:
         except Exception as e:
             return False, f"Test failed: {str(e)}"
     
+    def _tally_batch(self, outcome: Tuple[bool, str, Dict[str, Any]], batch_index: int,
+                     batch_len: int, errors: List[str]) -> Tuple[int, int]:
+        """
+        Turn one batch's send outcome into (successful, failed) event counts.
+        
+        Error messages are appended to `errors`, up to MAX_ERROR_KEEP.
+        """
+        success, message, response_data = outcome
+        
+        if not success:
+            if len(errors) < MAX_ERROR_KEEP:
+                errors.append(f"Batch {batch_index + 1}: {message}")
+            return 0, batch_len
+        
+        if not response_data:
+            # No detailed response, assume all events were successful
+            return batch_len, 0
+        
+        # Parse Supabase Edge Function response for detailed stats
+        batch_created = response_data.get('created', 0)
+        batch_updated = response_data.get('updated', 0)
+        batch_skipped = response_data.get('skipped', 0)
+        batch_errors = response_data.get('errors', 0)
+        
+        # Add error messages from the response, up to MAX_ERROR_KEEP
+        if len(errors) < MAX_ERROR_KEEP:
+            error_messages = response_data.get('details', {}).get('error_messages') or []
+            errors.extend(error_messages[:MAX_ERROR_KEEP - len(errors)])
+        
+        log_structured(logger, "Batch processed successfully",
+                     batch_index=batch_index + 1,
+                     created=batch_created,
+                     updated=batch_updated,
+                     skipped=batch_skipped,
+                     errors=batch_errors)
+        
+        return batch_created + batch_updated, batch_errors
+    
     def send_tracking_events(self, events: List[Dict[str, Any]]) -> SupabaseResult:
         """
         Send tracking events to Supabase Edge Function in batches.
@@ -215,48 +346,44 @@ class SupabaseService:
         error_count = 0
         errors = []
         
-        # Split into batches
-        event_batches = self._chunk_events(events)
+        # Batches are produced lazily; the byte cap can only add batches, so
+        # this count is a lower bound
+        min_batches = math.ceil(len(events) / self.batch_size)
         
         log_structured(logger, "Starting Supabase batch processing",
                       total_events=len(events),
-                      total_batches=len(event_batches),
-                      batch_size=self.batch_size)
+                      min_batches=min_batches,
+                      batch_size=self.batch_size,
+                      parallelism=self.parallelism)
         
-        for batch_index, batch in enumerate(event_batches):
-            log_structured(logger, "Processing batch",
-                         batch_index=batch_index + 1,
-                         batch_size=len(batch))
-            
-            success, message, response_data = self._send_batch_to_supabase(batch)
+        batches_sent = 0
+        
+        # Batches are independent, so send them concurrently. At most
+        # `parallelism` batches are in flight; the next one is only encoded
+        # once a slot frees up, and only (index, size) is kept per future so
+        # each batch is released as soon as its POST finishes
+        with ThreadPoolExecutor(max_workers=min(self.parallelism, min_batches)) as executor:
+            in_flight = {}
+            for batch_index, (batch, body) in enumerate(self._chunk_events(events)):
+                if len(in_flight) >= self.parallelism:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        successful, failed = self._tally_batch(future.result(), *in_flight.pop(future), errors)
+                        success_count += successful
+                        error_count += failed
+                
+                log_structured(logger, "Processing batch",
+                             batch_index=batch_index + 1,
+                             batch_size=len(batch))
+                future = executor.submit(self._send_batch_to_supabase, batch, body)
+                in_flight[future] = (batch_index, len(batch))
+                batches_sent += 1
+                del batch, body
             
-            if success:
-                # Parse Supabase Edge Function response for detailed stats
-                if response_data:
-                    batch_created = response_data.get('created', 0)
-                    batch_updated = response_data.get('updated', 0)
-                    batch_skipped = response_data.get('skipped', 0)
-                    batch_errors = response_data.get('errors', 0)
-                    
-                    success_count += (batch_created + batch_updated)
-                    error_count += batch_errors
-                    
-                    # Add any error messages from the response
-                    if response_data.get('details', {}).get('error_messages'):
-                        errors.extend(response_data['details']['error_messages'])
-                    
-                    log_structured(logger, "Batch processed successfully",
-                                 batch_index=batch_index + 1,
-                                 created=batch_created,
-                                 updated=batch_updated,
-                                 skipped=batch_skipped,
-                                 errors=batch_errors)
-                else:
-                    # No detailed response, assume all events were successful
-                    success_count += len(batch)
-            else:
-                error_count += len(batch)
-                errors.append(f"Batch {batch_index + 1}: {message}")
+            for future in as_completed(list(in_flight)):
+                successful, failed = self._tally_batch(future.result(), *in_flight.pop(future), errors)
+                success_count += successful
+                error_count += failed
         
         result = SupabaseResult(
             total=len(events),
@@ -266,6 +393,7 @@ class SupabaseService:
         )
         
         log_structured(logger, "Supabase batch processing completed",
+                      total_batches=batches_sent,
                       **result.to_dict())
         
         return result
\ No newline at end of file
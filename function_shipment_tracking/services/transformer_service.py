@@ -1,110 +1,138 @@
+import math
 import pandas as pd
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from collections import Counter
+from typing import List, Dict, Any, Tuple
 
 from utils.logging_utils import setup_logger, log_structured
 from utils.status_mapping import normalize_status
-from company_mapping import get_company_uuid, get_all_company_mappings
+from company_mapping import COMPANY_NAME_TO_UUID
 
 logger = setup_logger(__name__)
 
-class ShipmentTransformerService:
-    """Transform BigQuery tracking results to Supabase Edge Function format"""
+REQUIRED_FIELDS = [
+    'marketplace_order_id',
+    'marketplace',
+    'company_id',
+    'event_status',
+    'event_timestamp'
+]
+
+OPTIONAL_FIELDS = [
+    'event_location',
+    'courier_name',
+    'tracking_number',
+    'notes'
+]
+
+def _validate_required_fields(df: pd.DataFrame) -> Tuple[pd.DataFrame, Counter]:
+    """
+    Drop rows with any missing or blank required field in one pass.
     
-    @staticmethod
-    def _validate_required_fields(row: pd.Series) -> bool:
-        """Validate that required fields are present and valid"""
-        required_fields = [
-            'marketplace_order_id',
-            'marketplace', 
-            'company_id',
-            'event_status',
-            'event_timestamp'
-        ]
-        
-        for field in required_fields:
-            value = row.get(field)
-            if pd.isna(value) or value is None or str(value).strip() == '':
-                logger.warning(f"Missing required field '{field}' for order {row.get('marketplace_order_id', 'unknown')}")
-                return False
-        
-        return True
+    Returns:
+        Tuple of (valid rows, count of rows missing each required field)
+    """
+    required = df[REQUIRED_FIELDS]
+    invalid = required.isna() | required.astype(str).apply(lambda s: s.str.strip() == '')
+    missing_field_counts = Counter({
+        field: int(count) for field, count in invalid.sum().items() if count
+    })
+    return df.loc[~invalid.any(axis=1)].copy(), missing_field_counts
+
+def _format_timestamps(timestamps: pd.Series) -> pd.Series:
+    """Format timestamps to ISO 8601 in UTC (naive values are assumed UTC)"""
+    ts = pd.to_datetime(timestamps, utc=True, errors='coerce')
+    # Match Timestamp.isoformat(): fractional seconds only when non-zero, so
+    # whole-second events keep the exact string Supabase deduplicates on
+    fraction = ts.dt.strftime('.%f').where(ts.dt.microsecond != 0, '')
+    return (ts.dt.strftime('%Y-%m-%dT%H:%M:%S') + fraction + '+00:00').where(ts.notna())
+
+def _map_company_uuids(df: pd.DataFrame) -> Tuple[pd.DataFrame, Counter]:
+    """
+    Replace company names with Supabase UUIDs, dropping unmapped companies.
     
-    @staticmethod
-    def _format_timestamp(timestamp_value) -> Optional[str]:
-        """Format timestamp to ISO 8601 format"""
-        if pd.isna(timestamp_value) or timestamp_value is None:
-            return None
-        
-        try:
-            if isinstance(timestamp_value, pd.Timestamp):
-                ts = timestamp_value
-            elif isinstance(timestamp_value, datetime):
-                ts = pd.Timestamp(timestamp_value)
-            else:
-                ts = pd.to_datetime(timestamp_value, errors="coerce", utc=False)
-            
-            if pd.isna(ts):
-                logger.warning(f"Failed to parse timestamp: {timestamp_value}")
-                return None
-            
-            # Ensure timezone awareness (assume UTC if no timezone)
-            if ts.tzinfo is None:
-                ts = ts.tz_localize('UTC')
-            
-            return ts.isoformat()
-            
-        except Exception as e:
-            logger.error(f"Error formatting timestamp {timestamp_value}: {e}")
-            return None
+    Returns:
+        Tuple of (mapped rows, count of rows per unmapped company name)
+    """
+    company_names = df['company_id'].astype(str)
+    uuids = company_names.map(COMPANY_NAME_TO_UUID)
+    
+    unmapped = uuids.isna()
+    unmapped_companies = Counter({
+        name: int(count) for name, count in company_names[unmapped].value_counts().items()
+    })
+    
+    df = df.loc[~unmapped].copy()
+    df['company_id'] = uuids[~unmapped]
+    return df, unmapped_companies
+
+def _normalize_statuses(df: pd.DataFrame) -> List[str]:
+    """Normalize event statuses once per unique (marketplace, status) pair"""
+    # Clean whole columns with the vectorized .str accessor so the unique pairs
+    # collapse case/whitespace variants; normalize_status then runs once per pair
+    pairs = df[['marketplace', 'event_status']].astype(str).apply(
+        lambda s: s.str.strip().str.lower()
+    )
+    status_map = {
+        (marketplace, status): normalize_status(status, marketplace)
+        for marketplace, status in pairs.drop_duplicates().itertuples(index=False, name=None)
+    }
+    return [status_map[key] for key in pairs.itertuples(index=False, name=None)]
+
+def _build_tracking_events(df: pd.DataFrame, optional_cols: List[str]) -> List[Dict[str, Any]]:
+    """Build tracking event payloads, leaving out missing optional fields"""
+    # Iterate plain tuples so no intermediate dict or Series is built per row
+    tracking_events = []
+    for row in df[REQUIRED_FIELDS + optional_cols].itertuples(index=False, name=None):
+        event = dict(zip(REQUIRED_FIELDS, row))
+        for field, value in zip(optional_cols, row[len(REQUIRED_FIELDS):]):
+            if not (value is None or (isinstance(value, float) and math.isnan(value))):
+                event[field] = value
+        tracking_events.append(event)
+    
+    return tracking_events
+
+class ShipmentTransformerService:
+    """Transform BigQuery tracking results to Supabase Edge Function format"""
     
-    @staticmethod
-    def _build_tracking_event(row: pd.Series) -> Dict[str, Any]:
-        """Build tracking event payload for Supabase Edge Function"""
+    def _transform_vectorized(self, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Validate, normalize and shape tracking events column-wise.
         
-        # Normalize status using marketplace-specific mapping
-        normalized_status = normalize_status(
-            str(row['event_status']), 
-            str(row['marketplace'])
-        )
+        Returns:
+            Tuple of (tracking event payloads, validation summary counts)
+        """
+        transform_error_counts = Counter()
         
-        # Format timestamp
-        event_timestamp = ShipmentTransformerService._format_timestamp(row['event_timestamp'])
-        if not event_timestamp:
-            raise ValueError(f"Invalid event_timestamp for order {row['marketplace_order_id']}")
+        df, missing_field_counts = _validate_required_fields(df)
         
-        # Convert company name to UUID
-        company_name = str(row['company_id'])
-        try:
-            company_uuid = get_company_uuid(company_name)
-            print(f"COMPANY MAPPING: '{company_name}' -> '{company_uuid}'")
-        except ValueError as e:
-            print(f"COMPANY MAPPING ERROR: {str(e)}")
-            raise ValueError(f"Company mapping error for order {row['marketplace_order_id']}: {str(e)}")
+        # Format timestamps, dropping rows that cannot be parsed
+        df['event_timestamp'] = _format_timestamps(df['event_timestamp'])
+        transform_error_counts['invalid_event_timestamp'] = int(df['event_timestamp'].isna().sum())
+        df = df.dropna(subset=['event_timestamp'])
         
-        # Build the event payload
-        event = {
-            "marketplace_order_id": str(row['marketplace_order_id']),
-            "marketplace": str(row['marketplace']).lower(),
-            "company_id": company_uuid,  # Use UUID instead of name
-            "event_status": normalized_status,
-            "event_timestamp": event_timestamp
-        }
+        df, unmapped_companies = _map_company_uuids(df)
+        transform_error_counts['unmapped_company'] = sum(unmapped_companies.values())
         
-        # Add optional fields if present
-        optional_fields = {
-            'event_location': 'event_location',
-            'courier_name': 'courier_name', 
-            'tracking_number': 'tracking_number',
-            'notes': 'notes'
+        # Normalize status using marketplace-specific mapping
+        df['event_status'] = _normalize_statuses(df)
+        df['marketplace'] = df['marketplace'].astype(str).str.lower()
+        df['marketplace_order_id'] = df['marketplace_order_id'].astype(str)
+        
+        # Blank optional fields become missing so they are left out of the payload
+        optional_cols = []
+        for field in OPTIONAL_FIELDS:
+            if field not in df.columns:
+                continue
+            stripped = df[field].astype(str).str.strip()
+            df[field] = stripped.where(df[field].notna() & (stripped != ''))
+            optional_cols.append(field)
+        
+        summary = {
+            'missing_field_counts': dict(missing_field_counts),
+            'transform_errors': {k: v for k, v in transform_error_counts.items() if v},
+            'unmapped_companies': dict(unmapped_companies)
         }
-        
-        for event_field, row_field in optional_fields.items():
-            value = row.get(row_field)
-            if not pd.isna(value) and value is not None and str(value).strip():
-                event[event_field] = str(value).strip()
-        
-        return event
+        return _build_tracking_events(df, optional_cols), summary
     
     def transform_to_tracking_events(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
         """
@@ -120,37 +148,24 @@ class ShipmentTransformerService:
             logger.info("No tracking events to transform")
             return []
         
-        # Log available company mappings for visibility
-        company_mappings = get_all_company_mappings()
-        print(f"COMPANY MAPPINGS LOADED: {company_mappings}")
-        log_structured(logger, "Company mappings loaded",
-                      mappings=company_mappings,
-                      total_companies=len(company_mappings))
+        tracking_events, summary = self._transform_vectorized(df)
+        skipped_count = len(df) - len(tracking_events)
         
-        tracking_events = []
-        skipped_count = 0
-        
-        for index, row in df.iterrows():
-            try:
-                # Validate required fields
-                if not self._validate_required_fields(row):
-                    skipped_count += 1
-                    continue
-                
-                # Build tracking event
-                event = self._build_tracking_event(row)
-                tracking_events.append(event)
-                
-            except Exception as e:
-                marketplace = row.get('marketplace', 'unknown')
-                order_id = row.get('marketplace_order_id', 'unknown')
-                logger.error(f"Event transformation failed: {marketplace} {order_id}: {str(e)}")
-                skipped_count += 1
-                continue
+        # One entry per batch instead of one per invalid row. Unmapped companies
+        # are a config error (COMPANY_NAME_TO_UUID) that drops all their events,
+        # so they keep the ERROR severity alerting relies on
+        if summary['unmapped_companies']:
+            severity = 'ERROR'
+        elif skipped_count:
+            severity = 'WARNING'
+        else:
+            severity = 'INFO'
         
         log_structured(logger, "Tracking events transformation completed",
+                      severity=severity,
                       total_rows=len(df),
                       valid_events=len(tracking_events),
-                      skipped_events=skipped_count)
+                      skipped_events=skipped_count,
+                      **summary)
         
-        return tracking_events
\ No newline at end of file
+        return tracking_events
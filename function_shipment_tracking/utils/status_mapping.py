@@ -5,8 +5,10 @@ Maps marketplace-specific statuses to PlugUp standard statuses according to:
 function_shipment_tracking/docs/plan_to_push_orders_to_supabase.md
 """
 
+from functools import lru_cache
 from typing import Dict, List
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -80,6 +82,37 @@ MARKETPLACE_STATUS_MAPPING: Dict[str, Dict[str, str]] = {
     }
 }
 
+# Lowercased lookup tables built once at import. A raw status listed under
+# several PlugUp statuses keeps its first match, as the original scan did.
+_MP_LOWER: Dict[str, Dict[str, str]] = {
+    marketplace: {raw.lower(): plugup for raw, plugup in mapping.items()}
+    for marketplace, mapping in MARKETPLACE_STATUS_MAPPING.items()
+}
+
+_RAW_TO_PLUGUP: Dict[str, str] = {}
+for _plugup_status, _raw_statuses in PLUGUP_STATUS_MAPPING.items():
+    for _raw in _raw_statuses:
+        _RAW_TO_PLUGUP.setdefault(_raw.lower(), _plugup_status)
+
+# Canonical PlugUp statuses pass through unchanged
+_VALID_PLUGUP = frozenset(PLUGUP_STATUS_MAPPING)
+
+@lru_cache(maxsize=2048)
+def _normalize_clean_status(clean_status: str, clean_marketplace: str) -> str:
+    """Look up an already cleaned (lowercased, stripped) status; memoized since mappings are static"""
+    if clean_status in _VALID_PLUGUP:
+        return clean_status
+    
+    # Try marketplace-specific mapping first, then general PlugUp mapping
+    normalized = (_MP_LOWER.get(clean_marketplace, {}).get(clean_status)
+                  or _RAW_TO_PLUGUP.get(clean_status))
+    if normalized:
+        return normalized
+    
+    # Log unmapped status for future reference (once per process, as the result is cached)
+    logger.warning(f"Unmapped status: {clean_marketplace} '{clean_status}' - using 'pending' as fallback")
+    return 'pending'  # Default fallback
+
 def normalize_status(raw_status: str, marketplace: str) -> str:
     """
     Normalize marketplace-specific status to PlugUp standard status.
@@ -95,26 +128,13 @@ def normalize_status(raw_status: str, marketplace: str) -> str:
         logger.warning(f"Missing status or marketplace: status='{raw_status}', marketplace='{marketplace}'")
         return 'pending'  # Default fallback
     
-    # Clean and normalize input
-    clean_status = str(raw_status).lower().strip()
-    clean_marketplace = str(marketplace).lower().strip()
+    # Already canonical: skip cleaning and lookup entirely. Only str values are
+    # probed, so non-hashable inputs still reach the str() coercion below
+    if isinstance(raw_status, str) and raw_status in _VALID_PLUGUP:
+        return raw_status
     
-    # Try marketplace-specific mapping first
-    marketplace_mapping = MARKETPLACE_STATUS_MAPPING.get(clean_marketplace, {})
-    if clean_status in marketplace_mapping:
-        normalized = marketplace_mapping[clean_status]
-        logger.debug(f"Mapped {clean_marketplace} status '{raw_status}' -> '{normalized}'")
-        return normalized
-    
-    # Try general PlugUp mapping
-    for plugup_status, raw_statuses in PLUGUP_STATUS_MAPPING.items():
-        if clean_status in [s.lower() for s in raw_statuses]:
-            logger.debug(f"General mapping {clean_marketplace} status '{raw_status}' -> '{plugup_status}'")
-            return plugup_status
-    
-    # Log unmapped status for future reference
-    logger.warning(f"Unmapped status: {clean_marketplace} '{raw_status}' - using 'pending' as fallback")
-    return 'pending'  # Default fallback
+    return _normalize_clean_status(str(raw_status).lower().strip(),
+                                   str(marketplace).lower().strip())
 
 def get_supported_statuses() -> List[str]:
     """Get list of all supported PlugUp statuses"""
@@ -138,5 +158,7 @@ def validate_status_mapping():
     logger.info("Status mapping validation passed")
     return True
 
-# Validate mappings on import
-validate_status_mapping()
\ No newline at end of file
+# The mappings are literals, so checking them on every cold start is wasted work;
+# opt in (e.g. in CI or a staging deploy) with VALIDATE_STATUS_MAPPING=true
+if os.getenv('VALIDATE_STATUS_MAPPING', '').lower() in ('1', 'true', 'yes'):
+    validate_status_mapping()
\ No newline at end of file
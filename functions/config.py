@@ -14,5 +14,11 @@ class Config:
     WEBHOOK_TIMEOUT = int(os.getenv('WEBHOOK_TIMEOUT', 30))
     MAX_RETRY_ATTEMPTS = int(os.getenv('MAX_RETRY_ATTEMPTS', 3))
     
+    # Concurrent webhook requests
+    WEBHOOK_PARALLELISM = int(os.getenv('WEBHOOK_PARALLELISM', 16))
+    
+    # Multiplex webhook requests over HTTP/2 (falls back to the thread pool if unavailable)
+    WEBHOOK_HTTP2 = os.getenv('WEBHOOK_HTTP2', 'false').lower() in ('1', 'true', 'yes')
+    
     # Query parameters
     LOOKBACK_MINUTES = int(os.getenv('LOOKBACK_MINUTES', 65))
\ No newline at end of file
@@ -3,6 +3,7 @@ from flask import Request
 import json
 import pandas as pd
 from datetime import datetime
+from typing import Optional, Tuple
 
 from services.bigquery_service import BigQueryService
 from services.transformer_service import OrderTransformerService
@@ -11,6 +12,27 @@ from utils.logging_utils import setup_logger, log_structured
 
 logger = setup_logger(__name__)
 
+# Created once per instance so warm invocations reuse the client and HTTP pools
+_bq_service: Optional[BigQueryService] = None
+_webhook_service: Optional[WebhookService] = None
+
+def _get_services() -> Tuple[BigQueryService, WebhookService]:
+    """Build the services once per instance, retrying on later calls if construction failed"""
+    global _bq_service, _webhook_service
+    if _bq_service is None:
+        _bq_service = BigQueryService()
+    if _webhook_service is None:
+        _webhook_service = WebhookService()
+    return _bq_service, _webhook_service
+
+# A failure here (e.g. BigQuery client setup) must not break the import;
+# the first request rebuilds the services and reports the error as a 500
+try:
+    _get_services()
+except Exception as e:
+    log_structured(logger, "Cold-start service setup failed, deferring to first request",
+                  severity='ERROR', error=str(e))
+
 @functions_framework.http
 def process_orders(request: Request):
     """
@@ -21,20 +43,20 @@ def process_orders(request: Request):
     try:
         log_structured(logger, "Function started")
         
+        bq_service, webhook_service = _get_services()
+        
         # 1. Fetch orders from BigQuery
-        bq_service = BigQueryService()
-        df = bq_service.fetch_recent_orders()
+        table = bq_service.fetch_recent_orders()
         
-        if df.empty:
+        if table.num_rows == 0:
             log_structured(logger, "No orders found")
             return {'status': 'success', 'message': 'No orders to process'}, 200
         
         # 2. Transform to webhook format
         transformer = OrderTransformerService()
-        webhooks = transformer.transform_to_webhooks(df)
+        webhooks = transformer.transform_to_webhooks(table)
         
         # 3. Send to webhook
-        webhook_service = WebhookService()
         result = webhook_service.send_batch(webhooks)
         
         # 4. Return summary
@@ -1,6 +1,8 @@
 from google.cloud import bigquery
-from typing import Optional
-import pandas as pd
+from google.cloud import bigquery_storage
+from functools import lru_cache
+from typing import Optional, Tuple
+import pyarrow as pa
 from pathlib import Path
 
 from utils.logging_utils import setup_logger, log_structured
@@ -8,64 +10,94 @@ from config import Config
 
 logger = setup_logger(__name__)
 
+DEFAULT_MARKETPLACES = ['walm', 'cenc', 'fala', 'meli']
+
+QUERIES_DIR = Path(__file__).parent.parent / 'queries'
+
+_CLIENT: Optional[bigquery.Client] = None
+_BQSTORAGE_CLIENT: Optional[bigquery_storage.BigQueryReadClient] = None
+
+def _get_client(project_id: str) -> bigquery.Client:
+    """Lazily create one BigQuery client per process and reuse it across invocations"""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = bigquery.Client(project=project_id)
+    return _CLIENT
+
+def _get_bqstorage_client() -> bigquery_storage.BigQueryReadClient:
+    """Lazily create one Storage Read API client per process"""
+    global _BQSTORAGE_CLIENT
+    if _BQSTORAGE_CLIENT is None:
+        _BQSTORAGE_CLIENT = bigquery_storage.BigQueryReadClient()
+    return _BQSTORAGE_CLIENT
+
+@lru_cache(maxsize=None)
+def _read_sql(query_path: Path) -> str:
+    """Read a SQL file once per process; missing files are not cached"""
+    with open(query_path, 'r') as f:
+        return f.read()
+
+def _load_marketplace_query(marketplace: str) -> str:
+    """Load marketplace-specific query from marketplaces directory"""
+    query_path = QUERIES_DIR / 'marketplaces' / f'{marketplace}_orders.sql'
+    
+    try:
+        return _read_sql(query_path)
+    except FileNotFoundError:
+        logger.error(f"Marketplace query file not found: {query_path}")
+        raise
+
+@lru_cache(maxsize=8)
+def _compile_unified_query(marketplaces: Tuple[str, ...]) -> str:
+    """
+    Combine marketplace order queries with UNION ALL.
+    
+    The SQL files are static for a deployment, so the result is cached per
+    process and warm invocations skip the disk reads entirely.
+    """
+    queries = []
+    for marketplace in marketplaces:
+        try:
+            marketplace_query = _load_marketplace_query(marketplace)
+            # Remove trailing semicolon if present to avoid UNION ALL syntax errors
+            marketplace_query = marketplace_query.rstrip().rstrip(';')
+            # Wrap each query in parentheses for proper UNION ALL syntax
+            queries.append(f"(\n{marketplace_query}\n)")
+        except FileNotFoundError:
+            logger.warning(f"Skipping marketplace {marketplace} - query file not found")
+            continue
+    
+    if not queries:
+        raise ValueError("No valid marketplace queries found")
+    
+    unified_query = "\n\nUNION ALL\n\n".join(queries)
+    
+    log_structured(logger, "Built unified query",
+                  marketplaces=list(marketplaces),
+                  total_queries=len(queries))
+    
+    return unified_query
+
 class BigQueryService:
     """Handle all BigQuery operations"""
     
     def __init__(self, project_id: Optional[str] = None):
         self.project_id = project_id or Config.PROJECT_ID
-        self.client = bigquery.Client(project=self.project_id)
+        self.client = _get_client(self.project_id)
+        # Storage Read API streams results as Arrow instead of paging JSON rows
+        self.bqstorage_client = _get_bqstorage_client()
         
     def _load_query(self, query_name: str) -> str:
         """Load SQL query from file"""
-        query_path = Path(__file__).parent.parent / 'queries' / f'{query_name}.sql'
+        query_path = QUERIES_DIR / f'{query_name}.sql'
         
         try:
-            with open(query_path, 'r') as f:
-                return f.read()
+            return _read_sql(query_path)
         except FileNotFoundError:
             logger.error(f"Query file not found: {query_path}")
             raise
     
-    def _load_marketplace_query(self, marketplace: str) -> str:
-        """Load marketplace-specific query from marketplaces directory"""
-        query_path = Path(__file__).parent.parent / 'queries' / 'marketplaces' / f'{marketplace}_orders.sql'
-        
-        try:
-            with open(query_path, 'r') as f:
-                return f.read()
-        except FileNotFoundError:
-            logger.error(f"Marketplace query file not found: {query_path}")
-            raise
-    
-    def _build_unified_query(self, marketplaces: list = None) -> str:
-        """Build unified query by combining individual marketplace queries"""
-        if marketplaces is None:
-            marketplaces = ['walm', 'cenc', 'fala', 'meli']
-        
-        queries = []
-        for marketplace in marketplaces:
-            try:
-                marketplace_query = self._load_marketplace_query(marketplace)
-                # Remove trailing semicolon if present to avoid UNION ALL syntax errors
-                marketplace_query = marketplace_query.rstrip().rstrip(';')
-                # Wrap each query in parentheses for proper UNION ALL syntax
-                queries.append(f"(\n{marketplace_query}\n)")
-            except FileNotFoundError:
-                logger.warning(f"Skipping marketplace {marketplace} - query file not found")
-                continue
-        
-        if not queries:
-            raise ValueError("No valid marketplace queries found")
-        
-        unified_query = "\n\nUNION ALL\n\n".join(queries)
-        
-        log_structured(logger, "Built unified query",
-                      marketplaces=marketplaces,
-                      total_queries=len(queries))
-        
-        return unified_query
-    
-    def fetch_recent_orders(self, lookback_minutes: int = None, marketplaces: list = None) -> pd.DataFrame:
+    def fetch_recent_orders(self, lookback_minutes: int = None, marketplaces: list = None) -> pa.Table:
         """
         Fetch orders from multiple marketplaces created recently.
         
@@ -74,13 +106,13 @@ class BigQueryService:
             marketplaces: List of marketplaces to include (default: all available)
             
         Returns:
-            DataFrame with order data
+            Arrow table with order data
         """
         lookback = lookback_minutes or Config.LOOKBACK_MINUTES
         
         try:
-            # Build unified query dynamically from individual marketplace files
-            query = self._build_unified_query(marketplaces)
+            # Unified query over the marketplace files, built once per process
+            query = _compile_unified_query(tuple(marketplaces or DEFAULT_MARKETPLACES))
             
             # Use parameterized query for security
             job_config = bigquery.QueryJobConfig(
@@ -93,18 +125,28 @@ class BigQueryService:
             
             log_structured(logger, "Executing BigQuery",
                          lookback_minutes=lookback,
-                         marketplaces=marketplaces or ['walm', 'cenc', 'fala', 'meli'])
+                         marketplaces=marketplaces or DEFAULT_MARKETPLACES)
             
             query_job = self.client.query(query, job_config=job_config)
-            df = query_job.to_dataframe()
+            # The transformer reads Arrow columns directly, so skip pandas entirely
+            table = query_job.to_arrow(
+                bqstorage_client=self.bqstorage_client,
+                create_bqstorage_client=False
+            )
             
             log_structured(logger, "Query completed",
-                         rows_returned=len(df),
+                         rows_returned=table.num_rows,
                          bytes_processed=query_job.total_bytes_processed)
             
-            return df
+            return table
             
         except Exception as e:
             log_structured(logger, "BigQuery error",
                          severity='ERROR', error=str(e))
-            raise
\ No newline at end of file
+            raise
+
+# Build the default query during cold start so the first request doesn't pay for it
+try:
+    _compile_unified_query(tuple(DEFAULT_MARKETPLACES))
+except ValueError as e:
+    logger.error(f"Failed to preload unified query: {e}")
\ No newline at end of file
@@ -1,103 +1,161 @@
-import pandas as pd
-from typing import List, Dict, Any
+import pyarrow as pa
+from collections import namedtuple
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
 
-from utils.datetime_utils import to_iso8601_clt
+from utils.datetime_utils import to_iso8601_clt_arrow
 from utils.logging_utils import setup_logger, log_structured
 
 logger = setup_logger(__name__)
 
+# Columns read by the transformer, selected up front to fix tuple layout
+WEBHOOK_COLUMNS = [
+    'order_id',
+    'shipping_id',
+    'status',
+    'shipping_status',
+    'logistic_type',
+    'marketplace',
+    'order_created_at',
+    'shipping_promise_date',
+    'company_id',
+    'seller_sku',
+    'quantity',
+    'sku_name',
+    'market_place_match_id',
+    'order_item_id'
+]
+
+# One scanned row: the webhook columns plus their precomputed ISO dates
+WebhookRow = namedtuple('WebhookRow', WEBHOOK_COLUMNS + ['order_created_at_iso',
+                                                         'shipping_promise_date_iso'])
+
+@dataclass(slots=True)
+class WebhookPayload:
+    """Webhook body for one order; orjson serializes it natively, in field order"""
+    order: str
+    shipping_id: str
+    status: str
+    shipping_status: str
+    logistic_type: str
+    market_place: str
+    order_created_at: str
+    shipping_promise_date: Optional[str]  # Can be None - webhook handler will handle it
+    client_id: str
+    sku: Dict[str, Dict[str, Any]]
+
 class OrderTransformerService:
     """Transform BigQuery results to webhook format"""
     
     @staticmethod
-    def _build_sku_dict(group: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
-        """Build SKU dictionary from order items"""
+    def _build_sku_dict(rows: List[Tuple]) -> Dict[str, Dict[str, Any]]:
+        """Build SKU dictionary from order item rows"""
         sku_dict = {}
         
-        for _, row in group.iterrows():
-            seller_sku = str(row['seller_sku'])
+        for row in rows:
+            seller_sku = str(row.seller_sku)
             sku_dict[seller_sku] = {
-                "quantity": int(row['quantity']),
-                "name": str(row['sku_name']),
-                "market_place_match_id": str(row['market_place_match_id']),
-                "order_item_id": str(row.get('order_item_id', ''))
+                "quantity": int(row.quantity),
+                "name": str(row.sku_name),
+                "market_place_match_id": str(row.market_place_match_id),
+                "order_item_id": str(row.order_item_id)
             }
         
         return sku_dict
     
     @staticmethod
-    def _build_webhook_payload(order_id: str, first_row: pd.Series,
-                               sku_dict: Dict) -> Dict[str, Any]:
+    def _build_webhook_payload(order_id: str, first_row: Tuple,
+                               sku_dict: Dict) -> WebhookPayload:
         """Build complete webhook payload for an order"""
         # Log raw date values for debugging
-        order_created_raw = first_row.get('order_created_at')
-        shipping_promise_raw = first_row.get('shipping_promise_date')
+        order_created_raw = first_row.order_created_at
+        shipping_promise_raw = first_row.shipping_promise_date
         
-        logger.debug(f"Order {order_id} - Raw dates: order_created_at={order_created_raw} (type: {type(order_created_raw)}), shipping_promise_date={shipping_promise_raw} (type: {type(shipping_promise_raw)})")
+        logger.debug("Order %s - Raw dates: order_created_at=%r, shipping_promise_date=%r",
+                     order_id, order_created_raw, shipping_promise_raw)
         
-        # Convert dates with error handling
-        order_created_iso = to_iso8601_clt(order_created_raw)
-        shipping_promise_iso = to_iso8601_clt(shipping_promise_raw)
+        # Dates are converted column-wise in transform_to_webhooks
+        order_created_iso = first_row.order_created_at_iso
+        shipping_promise_iso = first_row.shipping_promise_date_iso
         
-        logger.debug(f"Order {order_id} - Converted dates: order_created_at={order_created_iso}, shipping_promise_date={shipping_promise_iso}")
+        logger.debug("Order %s - Converted dates: order_created_at=%s, shipping_promise_date=%s",
+                     order_id, order_created_iso, shipping_promise_iso)
         
         # Validate required date fields
         if order_created_iso is None:
-            logger.error(f"Order {order_id} - Missing or invalid order_created_at: {order_created_raw}")
+            logger.error("Order %s - Missing or invalid order_created_at: %r", order_id, order_created_raw)
             raise ValueError(f"Missing required date field: order_created_at for order {order_id}")
         
         # 🪲 DEBUG: Add detailed logging for shipping_promise_date handling
         if shipping_promise_iso is None:
-            logger.warning(f"Order {order_id} - shipping_promise_date is None/NaT: {shipping_promise_raw} (type: {type(shipping_promise_raw)})")
+            logger.warning("Order %s - shipping_promise_date is None/NaT: %r", order_id, shipping_promise_raw)
             # 🔧 FIX: shipping_promise_date should be optional, not required
             # Some orders may legitimately not have a shipping promise date
-            logger.info(f"Order {order_id} - Proceeding with null shipping_promise_date")
+            logger.info("Order %s - Proceeding with null shipping_promise_date", order_id)
         
-        return {
-            "order": str(order_id),
-            "shipping_id": str(first_row['shipping_id']),
-            "status": str(first_row['status']),
-            "shipping_status": str(first_row['shipping_status']),
-            "logistic_type": str(first_row['logistic_type']),
-            "market_place": str(first_row['marketplace']),
-            "order_created_at": order_created_iso,
-            "shipping_promise_date": shipping_promise_iso,  # Can be None - webhook handler will handle it
-            "client_id": str(first_row['company_id']),
-            "sku": sku_dict
-        }
+        # order_id (STRING, nulls dropped) and marketplace (SQL literal) are always str;
+        # nullable columns keep str() so NULLs serialize as before
+        return WebhookPayload(
+            order=order_id,
+            shipping_id=str(first_row.shipping_id),
+            status=str(first_row.status),
+            shipping_status=str(first_row.shipping_status),
+            logistic_type=str(first_row.logistic_type),
+            market_place=first_row.marketplace,
+            order_created_at=order_created_iso,
+            shipping_promise_date=shipping_promise_iso,
+            client_id=str(first_row.company_id),
+            sku=sku_dict
+        )
+    
+    def _append_webhook(self, webhooks: List[WebhookPayload], order_id: str,
+                        order_rows: List[Tuple]):
+        """Build the webhook payload for one order's rows, logging failures"""
+        first_row = order_rows[0]
+        try:
+            sku_dict = self._build_sku_dict(order_rows)
+            webhooks.append(self._build_webhook_payload(order_id, first_row, sku_dict))
+        except Exception as e:
+            # Log detailed error information for debugging
+            logger.error(f"Order transformation failed: {first_row.marketplace} {order_id}: {str(e)}")
     
-    def transform_to_webhooks(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def transform_to_webhooks(self, table: pa.Table) -> List[WebhookPayload]:
         """
-        Transform DataFrame to list of webhook payloads.
+        Transform Arrow table to list of webhook payloads.
         
         Args:
-            df: DataFrame from BigQuery with order data
+            table: Arrow table from BigQuery with order data
             
         Returns:
-            List of webhook payload dictionaries
+            List of webhook payloads
         """
-        if df.empty:
+        if table.num_rows == 0:
             logger.info("No orders to transform")
             return []
         
-        webhooks = []
+        # Read each column once into Python values; rows are zipped from the columns.
+        # Only order_item_id is optional; any other missing column fails loudly
+        columns = [
+            [''] * table.num_rows
+            if name == 'order_item_id' and name not in table.column_names
+            else table.column(name).to_pylist()
+            for name in WEBHOOK_COLUMNS
+        ]
+        
+        # Convert date columns to ISO 8601 CLT once instead of per order
+        columns.append(to_iso8601_clt_arrow(table.column('order_created_at')))
+        columns.append(to_iso8601_clt_arrow(table.column('shipping_promise_date')))
         
-        for order_id, group in df.groupby('order_id'):
-            try:
-                first_row = group.iloc[0]
-                sku_dict = self._build_sku_dict(group)
-                webhook = self._build_webhook_payload(order_id, first_row, sku_dict)
-                webhooks.append(webhook)
-                
-            except Exception as e:
-                # Log detailed error information for debugging
-                first_row = group.iloc[0] if not group.empty else None
-                if first_row is not None:
-                    marketplace=first_row.get('marketplace', 'unknown')
-                    logger.error(f"Order transformation failed: {marketplace} {order_id}: {str(e)}")
-                else:
-                    logger.error(f"Error transforming order {order_id}: {str(e)}")
-                continue
+        # Group in one hash pass; no sort needed, and each order's first row
+        # stays first, as with groupby. Rows without an order_id are dropped
+        rows_by_order: Dict[str, List[Tuple]] = {}
+        for row in map(WebhookRow._make, zip(*columns)):
+            if row.order_id is not None:
+                rows_by_order.setdefault(row.order_id, []).append(row)
+        
+        webhooks = []
+        for order_id, order_rows in rows_by_order.items():
+            self._append_webhook(webhooks, order_id, order_rows)
         
         logger.info(f"Transformed {len(webhooks)} orders")
         return webhooks
\ No newline at end of file
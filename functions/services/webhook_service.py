@@ -1,9 +1,16 @@
+import asyncio
+import httpx
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any, Tuple, List
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import time
 
 from config import Config
+from services.transformer_service import WebhookPayload
 from utils.logging_utils import setup_logger, log_structured
 
 logger = setup_logger(__name__)
@@ -35,60 +42,140 @@ class WebhookService:
         }
         self.timeout = Config.WEBHOOK_TIMEOUT
         self.max_retries = Config.MAX_RETRY_ATTEMPTS
+        self.parallelism = Config.WEBHOOK_PARALLELISM
+        self.http2 = Config.WEBHOOK_HTTP2
+        
+        # Keep-alive session so orders reuse pooled connections to the webhook
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=16,
+                              pool_maxsize=max(64, self.parallelism),
+                              max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
-    def _send_single_order(self, order: Dict[str, Any],
-                          retry_count: int = 0) -> Tuple[bool, str]:
+    def _send_single_order(self, order: WebhookPayload) -> Tuple[bool, str]:
         """
         Send single order to webhook with retry logic.
         
+        Server errors and timeouts are retried with exponential backoff;
+        other failures are returned immediately.
+        
         Returns:
             Tuple of (success: bool, message: str)
         """
         try:
-            response = requests.post(
-                url=self.url,
-                headers=self.headers,
-                json=order,
-                timeout=self.timeout
-            )
+            # orjson encodes the payload dataclass natively, much faster than stdlib json.
+            # Encode once; every attempt resends the same bytes
+            body = orjson.dumps(order)
+        except Exception as e:
+            return False, f"Exception: {str(e)}"
+        
+        error_msg = ""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(2 ** (attempt - 1))  # Exponential backoff
             
-            order_id = order.get('order', 'unknown')
-            marketplace = order.get('market_place', 'unknown')
+            try:
+                response = self.session.post(
+                    url=self.url,
+                    data=body,
+                    timeout=self.timeout
+                )
+            except requests.exceptions.Timeout:
+                error_msg = f"Timeout after {self.timeout}s"
+                continue
+            except Exception as e:
+                return False, f"Exception: {str(e)}"
             
-            logger.info(f"Webhook response: {marketplace} - {order_id}")
+            success, error_msg = self._check_response(order, response.status_code, response.text)
             
-            if response.status_code in [200, 201]:
-                logger.info(f"Webhook response: {marketplace} - {order_id}. Status code {response.status_code}")
-                return True, f"Success: {response.status_code}"
-            else:
-                logger.error(f"Webhook response: {marketplace} - {order_id}. Status code {response.status_code}. {response.text[:100]}")
-                error_msg = f"Failed: {response.status_code} - {response.text[:100]}"
+            # Only server errors are worth retrying
+            if success or response.status_code < 500:
+                return success, error_msg
+        
+        return False, error_msg
+    
+    async def _send_single_order_async(self, client: httpx.AsyncClient,
+                                       semaphore: asyncio.Semaphore,
+                                       order: WebhookPayload) -> Tuple[bool, str]:
+        """Async twin of _send_single_order for the HTTP/2 path, same retry policy"""
+        try:
+            body = orjson.dumps(order)
+        except Exception as e:
+            return False, f"Exception: {str(e)}"
+        
+        error_msg = ""
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(2 ** (attempt - 1))  # Exponential backoff
                 
-                # Retry on server errors
-                if response.status_code >= 500 and retry_count < self.max_retries:
-                    time.sleep(2 ** retry_count)  # Exponential backoff
-                    return self._send_single_order(order, retry_count + 1)
+                try:
+                    response = await client.post(self.url, content=body)
+                except httpx.TimeoutException:
+                    error_msg = f"Timeout after {self.timeout}s"
+                    continue
+                except Exception as e:
+                    return False, f"Exception: {str(e)}"
                 
-                return False, error_msg
+                success, error_msg = self._check_response(order, response.status_code, response.text)
                 
-        except requests.exceptions.Timeout:
-            error_msg = f"Timeout after {self.timeout}s"
-            
-            if retry_count < self.max_retries:
-                time.sleep(2 ** retry_count)
-                return self._send_single_order(order, retry_count + 1)
-            
-            return False, error_msg
-            
-        except Exception as e:
-            return False, f"Exception: {str(e)}"
+                # Only server errors are worth retrying
+                if success or response.status_code < 500:
+                    return success, error_msg
+        
+        return False, error_msg
     
-    def send_batch(self, orders: List[Dict[str, Any]]) -> WebhookResult:
+    def _check_response(self, order: WebhookPayload, status_code: int,
+                        text: str) -> Tuple[bool, str]:
+        """Log a webhook response and turn it into (success, message)"""
+        logger.info(f"Webhook response: {order.market_place} - {order.order}")
+        
+        if status_code in [200, 201]:
+            logger.info(f"Webhook response: {order.market_place} - {order.order}. Status code {status_code}")
+            return True, f"Success: {status_code}"
+        
+        logger.error(f"Webhook response: {order.market_place} - {order.order}. Status code {status_code}. {text[:100]}")
+        return False, f"Failed: {status_code} - {text[:100]}"
+    
+    def _build_async_client(self) -> httpx.AsyncClient:
+        """
+        HTTP/2 client multiplexing all orders over one connection.
+        
+        Raises ImportError when the h2 package is missing. Servers without
+        HTTP/2 negotiate HTTP/1.1, where the limit still allows one
+        connection per concurrent request.
+        """
+        return httpx.AsyncClient(
+            http2=True,
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.parallelism,
+                                max_keepalive_connections=self.parallelism)
+        )
+    
+    async def _send_all_async(self, client: httpx.AsyncClient,
+                              orders: List[WebhookPayload]) -> List[Tuple[bool, str]]:
+        """Send every order concurrently on the event loop"""
+        semaphore = asyncio.Semaphore(self.parallelism)
+        async with client:
+            return await asyncio.gather(*(
+                self._send_single_order_async(client, semaphore, order) for order in orders
+            ))
+    
+    def _send_all_threaded(self, orders: List[WebhookPayload]) -> List[Tuple[bool, str]]:
+        """Send every order concurrently on a thread pool over the pooled session"""
+        # Orders are independent and the calls are I/O bound, so send them concurrently
+        with ThreadPoolExecutor(max_workers=max(1, min(self.parallelism, len(orders)))) as executor:
+            return list(executor.map(self._send_single_order, orders))
+    
+    def send_batch(self, orders: List[WebhookPayload]) -> WebhookResult:
         """
         Send batch of orders to webhook.
         
         Args:
-            orders: List of order payload dictionaries
+            orders: List of order payloads
             
         Returns:
             WebhookResult with summary statistics
@@ -99,26 +186,35 @@ class WebhookService:
         
         logger.info(f"Starting webhook batch total_orders={len(orders)}")
         
-        for order in orders:
-            order_id = order.get('order', 'unknown')
-            marketplace = order.get('market_place', 'unknown')
-            
-            # Log the complete order payload for debugging
-            logger.info(f"""
-                "message": "Processing order with payload",
-                "order_id": {order_id},
-                "marketplace": {marketplace},
-                "order_created_at": {order.get('order_created_at')},
-                "shipping_promise_date": {order.get('shipping_promise_date')},
-                "payload_keys": {list(order.keys())}""")
-            
-            success, message = self._send_single_order(order)
-            
+        # Per-order payload logs are only worth formatting when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            for order in orders:
+                log_structured(logger, "Processing order with payload",
+                               severity='DEBUG',
+                               order_id=order.order,
+                               marketplace=order.market_place,
+                               order_created_at=order.order_created_at,
+                               shipping_promise_date=order.shipping_promise_date)
+        
+        client = None
+        if self.http2:
+            try:
+                client = self._build_async_client()
+            except ImportError as e:
+                log_structured(logger, "HTTP/2 unavailable, falling back to thread pool",
+                               severity='WARNING', error=str(e))
+        
+        if client is not None:
+            results = asyncio.run(self._send_all_async(client, orders))
+        else:
+            results = self._send_all_threaded(orders)
+        
+        for order, (success, message) in zip(orders, results):
             if success:
                 success_count += 1
             else:
                 error_count += 1
-                errors.append(f"Order {order_id} ({marketplace}): {message}")
+                errors.append(f"Order {order.order} ({order.market_place}): {message}")
         
         result = WebhookResult(
             total=len(orders),
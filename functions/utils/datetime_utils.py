@@ -1,9 +1,16 @@
 import pandas as pd
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import List, Optional
 from zoneinfo import ZoneInfo
 import logging
 
-CLT = ZoneInfo("America/Santiago")
+CLT_NAME = "America/Santiago"
+CLT = ZoneInfo(CLT_NAME)
+
+# strftime's %z has no colon (-0300); callers insert it for ISO 8601 extended format (-03:00)
+ISO8601_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
 logger = logging.getLogger(__name__)
 
 def to_iso8601_clt(value):
@@ -16,40 +23,49 @@ def to_iso8601_clt(value):
     Returns:
         ISO 8601 string with CLT offset or None
     """
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        logger.debug(f"Input value is None or NaN: {value} (type: {type(value)})")
+    # None, NaN and NaT all mean "no date"
+    if value is None or value is pd.NaT or (isinstance(value, float) and pd.isna(value)):
         return None
 
-    # 🪲 DEBUG: Enhanced logging for NaT detection
-    logger.debug(f"Converting date value: {value} (type: {type(value)})")
-    
-    # Check for pandas NaT specifically
-    if hasattr(value, '__class__') and 'NaTType' in str(value.__class__):
-        logger.warning(f"Detected pandas NaT value: {value} (type: {type(value)}) - returning None")
+    # One parse + one tz step; Timestamps pass straight through
+    try:
+        ts = value if isinstance(value, pd.Timestamp) else pd.Timestamp(value)
+        if pd.isna(ts):
+            return None
+        ts = ts.tz_convert(CLT) if ts.tzinfo is not None else ts.tz_localize(CLT)
+        formatted = ts.strftime(ISO8601_FORMAT)
+        return f"{formatted[:-2]}:{formatted[-2:]}"
+    except Exception as e:
+        logger.warning("Failed to convert date value %r: %s - returning None", value, e)
         return None
 
-    # Normalize to pandas.Timestamp
-    if isinstance(value, pd.Timestamp):
-        ts = value
-    elif isinstance(value, datetime):
-        ts = pd.Timestamp(value)
+def to_iso8601_clt_arrow(values: pa.ChunkedArray) -> List[Optional[str]]:
+    """
+    Vectorized to_iso8601_clt for a whole Arrow column.
+    
+    TIMESTAMP columns are converted and formatted with Arrow compute kernels;
+    any other type falls back to to_iso8601_clt value by value.
+    
+    Args:
+        values: Arrow column of timestamps (or strings/dates for the fallback)
+        
+    Returns:
+        List of ISO 8601 strings with CLT offset, or None where null/invalid
+    """
+    if not pa.types.is_timestamp(values.type):
+        return [to_iso8601_clt(value) for value in values.to_pylist()]
+    
+    # Whole seconds, as before; Arrow's %S would otherwise print fractional seconds
+    if values.type.tz is None:
+        # Naive values are local CLT times
+        ts = values.cast(pa.timestamp('s'), safe=False)
+        ts = pc.assume_timezone(ts, timezone=CLT_NAME,
+                                ambiguous='earliest', nonexistent='earliest')
     else:
-        ts = pd.to_datetime(value, errors="coerce", utc=False)
-
-    if pd.isna(ts):
-        logger.warning(f"Failed to parse date value: {value} (type: {type(value)}) - returning None instead of raw string")
-        return None  # Return None instead of str(value) to avoid invalid date formats
-
-    # Convert to CLT timezone
-    try:
-        if ts.tzinfo is not None:
-            ts = ts.tz_convert(CLT)
-        else:
-            ts = ts.tz_localize(CLT)
-
-        result = ts.isoformat(timespec="seconds")
-        logger.debug(f"Successfully converted to: {result}")
-        return result
-    except Exception as e:
-        logger.error(f"Error converting timezone for value {value}: {e}")
-        return None
\ No newline at end of file
+        # Same instants, only the display timezone changes
+        ts = values.cast(pa.timestamp('s', tz=CLT_NAME), safe=False)
+    
+    formatted = pc.strftime(ts, format=ISO8601_FORMAT)
+    formatted = pc.replace_substring_regex(formatted, pattern=r"([+-]\d{2})(\d{2})$",
+                                           replacement=r"\1:\2")
+    return formatted.to_pylist()
\ No newline at end of file
@@ -1,5 +1,5 @@
 import logging
-import json
+import orjson
 from typing import Any, Dict
 
 def setup_logger(name: str = __name__) -> logging.Logger:
@@ -22,4 +22,4 @@ def log_structured(logger: logging.Logger, message: str,
         'severity': severity,
         **kwargs
     }
-    logger.info(json.dumps(log_entry))
\ No newline at end of file
+    logger.info(orjson.dumps(log_entry).decode())
\ No newline at end of file